@@ -1,10 +1,18 @@
 import os
-import json
+import shelve
+import orjson
 import time
-import requests
+import random
+import asyncio
+import aiohttp
 from urllib.parse import urlparse
 from datetime import datetime
 
+try:
+    import zstandard  # Optional: only needed for compressed (.json.zst) chunks
+except ImportError:
+    zstandard = None
+
 # == CONFIGURATION SETTINGS ==
 DEFAULT_CHUNK_SIZE = 50            # Number of files per JSON chunk
 DEFAULT_MAX_DEPTH = 10             # Maximum directory recursion depth
@@ -13,8 +21,14 @@ DEFAULT_FILE_EXTENSIONS = [        # File types to crawl
     '.rst', '.adoc', '.markdown'
 ]
 OUTPUT_BASE_DIR = "github_api_crawled_data"  # Base output directory
-REQUEST_DELAY = 0.5                # Seconds between API requests
+REQUEST_DELAY = 0.5                # Seconds each worker pauses after a request (overall ~concurrency/delay req/s)
 RATE_LIMIT_BUFFER = 10             # Minimum remaining requests before pausing
+MAX_CONCURRENT_REQUESTS = 16       # Worker tasks, i.e. API calls and downloads in flight at once
+MAX_RETRIES = 5                    # Attempts per request on errors and rate limits
+MAX_BACKOFF = 60                   # Upper bound in seconds for retry backoff
+SECONDARY_LIMIT_WAIT = 60          # Seconds to wait on a secondary rate limit without Retry-After
+BLOB_CACHE_MAX_BYTES = 1024 * 1024 # Larger files are re-downloaded instead of cached
+COMPRESS_CHUNKS = False            # Write zstd-compressed .json.zst chunks (needs zstandard)
 # ============================
 
 class GitHubAPICrawler:
@@ -25,21 +39,41 @@ class GitHubAPICrawler:
             'max_depth': kwargs.get('max_depth', DEFAULT_MAX_DEPTH),
             'extensions': kwargs.get('extensions', DEFAULT_FILE_EXTENSIONS),
             'request_delay': kwargs.get('request_delay', REQUEST_DELAY),
+            'concurrency': kwargs.get('concurrency', MAX_CONCURRENT_REQUESTS),
+            'compress': kwargs.get('compress', COMPRESS_CHUNKS),
         }
         
+        # Tuple so one str.endswith call checks every extension
+        self.extensions = tuple(self.config['extensions'])
+        
         # Extract repository information
         self.parse_repo_url(repo_url)
         self.token = token or os.getenv('GITHUB_TOKEN')
         
-        # Configure API connection
-        self.session = requests.Session()
-        self.headers = {'Authorization': f'token {self.token}'} if self.token else {}
+        # Configure API connection (the session is opened in crawl_async)
+        self.session = None
+        self.headers = {
+            'Accept-Encoding': 'gzip, deflate, br',  # br is decoded via the brotli package
+            'Connection': 'keep-alive'
+        }
+        if self.token:
+            self.headers['Authorization'] = f'token {self.token}'
         self.base_api_url = f"https://api.github.com/repos/{self.owner}/{self.repo}/contents"
         
         # Initialize crawling state
-        self.crawled_data = []
+        self.chunk_file = None  # Open chunk file that documents are streamed into
+        self.compressor = None
+        if self.config['compress']:
+            if zstandard is None:
+                raise ImportError("Chunk compression requires the zstandard package")
+            self.compressor = zstandard.ZstdCompressor(level=3, threads=-1)
+        self.chunk_documents = 0
         self.chunk_counter = 1
+        self.total_documents = 0
         self.rate_limit_remaining = 5000  # Default for authenticated requests
+        self.rate_limit_reset = 0         # Unix time the quota refills, from X-RateLimit-Reset
+        self.rate_limit_lock = asyncio.Lock()
+        self.queue = None  # (item, depth) work queue, created in crawl_async
         
         # Set up output directory structure
         self.output_dir = os.path.join(
@@ -47,6 +81,11 @@ class GitHubAPICrawler:
             f"{self.owner}-{self.repo}"
         )
         os.makedirs(self.output_dir, exist_ok=True)
+        
+        # ETag -> response cache, so unchanged listings come back as free 304s on re-crawls
+        self.etag_cache = shelve.open(os.path.join(self.output_dir, '.etags'))
+        # Blob SHA -> file contents; SHAs are content-addressed so entries never go stale
+        self.blob_cache = shelve.open(os.path.join(self.output_dir, '.blobs'))
 
     def parse_repo_url(self, url):
         """Extract owner, repo, and base path from GitHub URL"""
@@ -62,35 +101,86 @@ class GitHubAPICrawler:
         else:
             self.base_path = ''
 
-    def check_rate_limit(self):
+    async def check_rate_limit(self):
         """Monitor and enforce GitHub API rate limits"""
-        if self.rate_limit_remaining <= RATE_LIMIT_BUFFER:
-            reset_time = int(self.session.get(
-                'https://api.github.com/rate_limit'
-            ).json()['resources']['core']['reset'])
+        # First task to notice low quota pauses; the rest wait on the lock
+        async with self.rate_limit_lock:
+            if self.rate_limit_remaining <= RATE_LIMIT_BUFFER:
+                sleep_time = max(self.rate_limit_reset - time.time(), 0) + 1
+                print(f"Rate limit low. Pausing for {sleep_time:.0f} seconds")
+                await asyncio.sleep(sleep_time)
+                self.rate_limit_remaining = 5000  # Reset after sleep
+
+    def update_rate_limit(self, headers):
+        """Track remaining quota from the headers GitHub sends on every API response"""
+        if 'X-RateLimit-Remaining' in headers:
+            self.rate_limit_remaining = int(headers['X-RateLimit-Remaining'])
+            self.rate_limit_reset = int(headers.get('X-RateLimit-Reset', 0))
+
+    def rate_limit_wait(self, headers):
+        """Seconds to wait before retrying a 403/429 response"""
+        if 'Retry-After' in headers:  # Secondary rate limit
+            return int(headers['Retry-After'])
+        if headers.get('X-RateLimit-Remaining') == '0':
+            return max(int(headers.get('X-RateLimit-Reset', 0)) - time.time(), 0) + 1
+        # Quota left but still refused: GitHub's secondary limit, which asks for at least a minute
+        return SECONDARY_LIMIT_WAIT
+
+    async def request(self, url, headers=None):
+        """GET a URL, waiting out rate limits and retrying transient failures"""
+        for attempt in range(MAX_RETRIES):
+            await self.check_rate_limit()
+            backoff = min(2 ** attempt, MAX_BACKOFF) + random.random()
+            
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    self.update_rate_limit(response.headers)
+                    status, response_headers = response.status, response.headers
+                    content = await response.read()
+                await asyncio.sleep(self.config['request_delay'])  # Per worker, not global
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Request to {url} failed: {str(e)}")
+                await asyncio.sleep(backoff)
+                continue
             
-            sleep_time = max(reset_time - int(time.time()), 0) + 10
-            print(f"Rate limit low. Pausing for {sleep_time} seconds")
-            time.sleep(sleep_time)
-            self.rate_limit_remaining = 5000  # Reset after sleep
+            if status in (403, 429):
+                wait = self.rate_limit_wait(response_headers)
+                print(f"Rate limit exceeded, waiting {wait:.0f} seconds...")
+                await asyncio.sleep(wait)
+            elif status >= 500:
+                print(f"Server error {status} for {url}, retrying...")
+                await asyncio.sleep(backoff)
+            else:
+                return status, response_headers, content
+        
+        print(f"Giving up on {url} after {MAX_RETRIES} attempts")
+        return None, None, None
 
-    def get_api_content(self, path):
+    async def get_api_content(self, path):
         """Fetch content from GitHub API with error handling"""
-        self.check_rate_limit()
         url = f"{self.base_api_url}/{path}"
         
+        cached = self.etag_cache.get(url)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        
         try:
-            response = self.session.get(url, headers=self.headers)
-            self.rate_limit_remaining = int(
-                response.headers.get('X-RateLimit-Remaining', 10)
-            )
+            status, response_headers, content = await self.request(url, headers)
             
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 403:
-                print("Rate limit exceeded, waiting...")
-                time.sleep(60)
-                return self.get_api_content(path)
+            if status == 304:
+                return orjson.loads(cached[1])
+            elif status == 200:
+                listing = orjson.loads(content)
+                
+                # Best effort: a failed cache write must not cost the listing
+                etag = response_headers.get('ETag')
+                if etag:
+                    try:
+                        self.etag_cache[url] = (etag, content)
+                    except Exception as e:
+                        print(f"Could not cache ETag for {url}: {str(e)}")
+                return listing
+            elif status is not None:
+                print(f"API request failed: {url} returned {status}")
                 
         except Exception as e:
             print(f"API request failed: {str(e)}")
@@ -99,7 +189,7 @@ class GitHubAPICrawler:
         return None
 
     def process_content(self, content, current_depth):
-        """Recursive content processing with depth control"""
+        """Queue directory entries with depth control"""
         if current_depth > self.config['max_depth']:
             return
 
@@ -110,90 +200,147 @@ class GitHubAPICrawler:
             self.process_item(content, current_depth)
 
     def process_item(self, item, current_depth):
-        """Handle individual files and directories"""
+        """Queue individual files and directories for the workers"""
         if item['type'] == 'dir':
-            self.process_directory(item['path'], current_depth + 1)
+            self.queue.put_nowait((item, current_depth + 1))
         elif item['type'] == 'file':
-            self.process_file(item)
+            self.queue.put_nowait((item, current_depth))
 
-    def process_directory(self, path, current_depth):
+    async def process_directory(self, path, current_depth):
         """Process directory contents"""
         print(f"Processing directory: {path}")
-        content = self.get_api_content(path)
-        time.sleep(self.config['request_delay'])
+        content = await self.get_api_content(path)
         
         if content:
             self.process_content(content, current_depth)
 
-    def process_file(self, item):
+    async def worker(self):
+        """Handle queued files and directories until cancelled"""
+        while True:
+            item, depth = await self.queue.get()
+            try:
+                if item['type'] == 'dir':
+                    await self.process_directory(item['path'], depth)
+                else:
+                    await self.process_file(item)
+            except Exception as e:
+                print(f"Failed to process {item['path']}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def process_file(self, item):
         """Download and store file contents"""
-        if any(item['name'].lower().endswith(ext) 
-             for ext in self.config['extensions']):
+        if item['name'].lower().endswith(self.extensions):
             
-            print(f"Downloading: {item['path']}")
-            content = self.download_content(item['download_url'])
+            content = self.blob_cache.get(item['sha'])
+            cached = content is not None
+            if not cached:
+                print(f"Downloading: {item['path']}")
+                content = await self.download_content(item['download_url'])
             
             if content:
                 self.store_document(item, content)
+                
+                # Best effort: a failed cache write must not cost the stored document
+                if not cached and item['size'] <= BLOB_CACHE_MAX_BYTES:
+                    try:
+                        self.blob_cache[item['sha']] = content
+                    except Exception as e:
+                        print(f"Could not cache {item['path']}: {str(e)}")
 
-    def download_content(self, download_url):
+    async def download_content(self, download_url):
         """Download file contents with error handling"""
-        try:
-            response = self.session.get(download_url, headers=self.headers)
-            time.sleep(self.config['request_delay'])
-            return response.text
-        except Exception as e:
-            print(f"Download failed: {str(e)}")
+        status, _, content = await self.request(download_url)
+        
+        if status != 200:
+            if status is not None:
+                print(f"Download failed: {download_url} returned {status}")
             return None
+        
+        return content.decode('utf-8', errors='replace')
+
+    def open_chunk(self):
+        """Start a new chunk file in the output directory and write its metadata"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"chunk_{timestamp}_{self.chunk_counter}.json"
+        if self.compressor:
+            filename += '.zst'
+        
+        self.chunk_file = open(os.path.join(self.output_dir, filename), 'wb')
+        if self.compressor:
+            self.chunk_file = self.compressor.stream_writer(self.chunk_file)
+        # Shared by every document in the chunk instead of formatting a timestamp per file
+        self.chunk_started = datetime.now().isoformat()
+        self.chunk_file.write(b'{"metadata":' + orjson.dumps({
+            'repo': f"{self.owner}/{self.repo}",
+            'base_path': self.base_path,
+            'crawled_at': self.chunk_started
+        }) + b',"documents":[')
+        self.chunk_documents = 0
 
     def store_document(self, item, content):
-        """Store document data in memory chunk"""
-        self.crawled_data.append({
+        """Stream document data into the current chunk file"""
+        if self.chunk_file is None:
+            self.open_chunk()
+        
+        self.chunk_file.write((b',\n' if self.chunk_documents else b'\n') + orjson.dumps({
             'path': item['path'],
             'url': item['html_url'],
             'content': content,
             'sha': item['sha'],
             'size': item['size'],
-            'timestamp': datetime.now().isoformat()
-        })
+            'timestamp': self.chunk_started
+        }))
+        self.chunk_documents += 1
+        self.total_documents += 1
         
-        if len(self.crawled_data) >= self.config['chunk_size']:
+        if self.chunk_documents >= self.config['chunk_size']:
             self.save_chunk()
 
     def save_chunk(self):
-        """Save current chunk to organized directory structure"""
-        if not self.crawled_data:
+        """Close out the current chunk file"""
+        if self.chunk_file is None:
             return
 
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"chunk_{timestamp}_{self.chunk_counter}.json"
-        output_path = os.path.join(self.output_dir, filename)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'metadata': {
-                    'repo': f"{self.owner}/{self.repo}",
-                    'base_path': self.base_path,
-                    'crawled_at': datetime.now().isoformat()
-                },
-                'documents': self.crawled_data
-            }, f, indent=2, ensure_ascii=False)
-        
-        print(f"Saved chunk {self.chunk_counter} with {len(self.crawled_data)} documents")
-        self.crawled_data = []
+        self.chunk_file.write(b'\n]}\n')
+        self.chunk_file.close()
+        
+        print(f"Saved chunk {self.chunk_counter} with {self.chunk_documents} documents")
+        self.chunk_file = None
         self.chunk_counter += 1
 
-    def crawl(self):
+    async def crawl_async(self):
         """Main crawl execution method"""
         print(f"\nStarting crawl of {self.owner}/{self.repo}")
         print(f"Output directory: {os.path.abspath(self.output_dir)}")
         
-        start_path = self.base_path or ''
-        self.process_directory(start_path, 0)
-        self.save_chunk()  # Save remaining documents
+        connector = aiohttp.TCPConnector(
+            limit=self.config['concurrency'],
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True
+        )
+        try:
+            async with aiohttp.ClientSession(headers=self.headers, connector=connector) as self.session:
+                start_path = self.base_path or ''
+                self.queue = asyncio.Queue()
+                self.queue.put_nowait(({'type': 'dir', 'path': start_path}, 0))
+                
+                # A fixed pool of workers keeps `concurrency` requests in flight end to end
+                workers = [asyncio.create_task(self.worker())
+                           for _ in range(self.config['concurrency'])]
+                await self.queue.join()
+                
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            self.etag_cache.close()
+            self.blob_cache.close()
+            self.save_chunk()  # Save remaining documents, even on Ctrl-C or errors
         
-        print(f"\nCrawl complete. Total documents processed: "
-              f"{(self.chunk_counter-1)*self.config['chunk_size'] + len(self.crawled_data)}")
+        print(f"\nCrawl complete. Total documents processed: {self.total_documents}")
 
 def main():
     print("GitHub API Documentation Crawler")
@@ -208,10 +355,12 @@ def main():
         chunk_size=DEFAULT_CHUNK_SIZE,
         max_depth=DEFAULT_MAX_DEPTH,
         extensions=DEFAULT_FILE_EXTENSIONS,
-        request_delay=REQUEST_DELAY
+        request_delay=REQUEST_DELAY,
+        concurrency=MAX_CONCURRENT_REQUESTS,
+        compress=COMPRESS_CHUNKS
     )
     
-    crawler.crawl()
+    asyncio.run(crawler.crawl_async())
 
 if __name__ == "__main__":
     main()
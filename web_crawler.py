@@ -1,14 +1,32 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import json
+import asyncio
+import aiohttp
+import lxml.html
+from lxml import etree
+from pybloom_live import ScalableBloomFilter
+from urllib.parse import urljoin, urlparse, urlsplit
+import orjson
+import hashlib
 import os
 import time
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import re
+import multiprocessing
+import urllib.error
+import urllib.request
 import urllib.robotparser
 
+try:
+    import uvloop  # Faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
+try:
+    import zstandard  # Optional: only needed for compressed (.json.zst) chunks
+except ImportError:
+    zstandard = None
+
 # Exclude URLs with hashtags, question marks, and equals signs
 exclude = [
     # Country or region-specific paths
@@ -50,141 +68,365 @@ exclude = [
     '#', '?', '='
 ]
 
+# All exclude patterns in a single alternation, matched in one pass per URL
+EXCLUDE_RE = re.compile('|'.join(re.escape(pattern) for pattern in exclude), re.IGNORECASE)
+
+ROBOTS_MAX_BYTES = 500 * 1024  # Same robots.txt size cap that Google applies
+MAX_PAGE_BYTES = 5 * 1024 * 1024  # Larger responses are abandoned mid-download
+CONNECT_TIMEOUT = 10  # Seconds to establish a connection, within the overall timeout
+SKIP_HREF_PREFIXES = ('#', 'javascript:', 'mailto:', 'tel:')  # Never crawlable, skip before urljoin
+PARSE_IN_PROCESS_BYTES = 50 * 1024  # Larger pages are parsed in the process pool
+
+# Compiled once; plain strings so extracted links don't keep the page tree alive
+LINK_XPATH = etree.XPath('//a/@href', smart_strings=False)
+TEXT_XPATH = etree.XPath('//text()', smart_strings=False)
+TITLE_XPATH = etree.XPath('string(//title)', smart_strings=False)
+META_DESCRIPTION_XPATH = etree.XPath('string(//meta[@name="description"]/@content)', smart_strings=False)
+
+def parse_html(content, charset=None):
+    """Parse page bytes into an lxml tree, decoding them with the response charset"""
+    # With no header charset, default to UTF-8 unless the first 1024 bytes (where HTML
+    # declares it) name an encoding or start with a UTF-16 BOM, which lxml detects itself
+    if not charset:
+        head = content[:1024]
+        if b'charset' not in head.lower() and not head.startswith((b'\xff\xfe', b'\xfe\xff')):
+            charset = 'utf-8'
+    
+    return lxml.html.fromstring(content, parser=lxml.html.HTMLParser(encoding=charset))
+
+def parse_page(content, charset=None):
+    """Extract title, text, meta description and raw hrefs from page bytes"""
+    try:
+        tree = parse_html(content, charset)
+    except etree.ParserError:  # Empty, whitespace-only or comment-only body
+        return {'title': 'No title', 'text_content': '', 'meta_description': '', 'hrefs': []}
+    # Drop script/style bodies in C so the text pass needs no ancestor checks
+    etree.strip_elements(tree, 'script', 'style', with_tail=False)
+    
+    return {
+        'title': TITLE_XPATH(tree) or 'No title',
+        'text_content': ' '.join(filter(None, (text.strip() for text in TEXT_XPATH(tree)))),
+        'meta_description': META_DESCRIPTION_XPATH(tree),
+        'hrefs': LINK_XPATH(tree)
+    }
+
+def resolve_href(current_url, origin, href):
+    """urljoin with string-only fast paths for absolute and root-relative hrefs"""
+    if href.startswith(('http://', 'https://')):
+        return href
+    
+    # Protocol-relative (//host) and dot-segment paths still need full resolution
+    if href.startswith('/') and not href.startswith('//') and '/.' not in href:
+        return origin + href
+    
+    try:
+        return urljoin(current_url, href)
+    except ValueError:  # Malformed href, e.g. an invalid IPv6 host
+        return None
+
 class WebCrawler:
     
-    def __init__(self, base_url, chunk_size=50, max_depth=3):
+    def __init__(self, base_url, chunk_size=50, max_depth=3, concurrency=10, timeout=30, delay=0, compress=False):
         self.base_url = base_url
         self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.timeout = timeout
         parsed_url = urlparse(base_url)
         self.domain = parsed_url.netloc
         self.base_path = parsed_url.path.rstrip('/')
-        self.visited_urls = set()
+        # Same-host URLs under the base path start with one of these
+        self.url_prefixes = tuple(
+            f"{scheme}://{self.domain}{self.base_path or '/'}" for scheme in ('https', 'http')
+        )
+        # Bloom filter keeps memory flat on large crawls; a false positive skips a page, so keep it rare
+        self.visited_urls = ScalableBloomFilter(initial_capacity=100_000, error_rate=1e-5)
+        # 16-byte digests of stored page text, so the same page under another URL is kept once;
+        # an exact set because a false positive would drop a unique page from the output
+        self.content_hashes = set()
+        # LRU of recently seen URLs and their validity, checked before the full URL checks
+        self.recent_urls = OrderedDict()
+        self.recent_urls_size = 50_000
         self.chunk_size = chunk_size
-        self.current_chunk = []
+        self.chunk_file = None  # Open chunk file that pages are streamed into
+        # Opt-in: multi-threaded zstd shrinks text-heavy chunks several times over at little CPU cost
+        self.compressor = None
+        if compress:
+            if zstandard is None:
+                raise ImportError("Chunk compression requires the zstandard package")
+            self.compressor = zstandard.ZstdCompressor(level=3, threads=-1)
+        self.chunk_pages = 0
+        self.chunk_urls = {}  # Link URL -> index into the chunk's url_table
         self.chunk_counter = 1
         self.total_pages = 0
-        self.session = requests.Session()
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept-Encoding': 'gzip, deflate, br',  # br is decoded via the brotli package
+            'Connection': 'keep-alive'
         }
         
         # Initialize robots.txt parser
         self.robot_parser = urllib.robotparser.RobotFileParser()
         robots_url = urljoin(base_url, "/robots.txt")
         self.robot_parser.set_url(robots_url)
-        self.robot_parser.read()
+        self.read_robots()
+        self.robots_restricted = self.has_robots_restrictions()
 
-    def save_chunk(self, timestamp):
-        """Save current chunk to a JSON file"""
-        if not self.current_chunk:
+        # Space out fetches to each host by the robots.txt Crawl-delay, else by `delay`
+        self.crawl_delay = self.robot_parser.crawl_delay('*') or delay
+        self.host_locks = {}
+        self.last_fetched_at = {}
+
+    def read_robots(self):
+        """Fetch and parse robots.txt, reading at most ROBOTS_MAX_BYTES"""
+        try:
+            with urllib.request.urlopen(self.robot_parser.url, timeout=self.timeout) as f:
+                raw = f.read(ROBOTS_MAX_BYTES)
+        except urllib.error.HTTPError as err:
+            # Same status handling as RobotFileParser.read()
+            if err.code in (401, 403):
+                self.robot_parser.disallow_all = True
+            elif 400 <= err.code < 500:
+                self.robot_parser.allow_all = True
             return
+        
+        self.robot_parser.parse(raw.decode('utf-8', errors='ignore').splitlines())
+
+    def has_robots_restrictions(self):
+        """Check whether robots.txt can disallow anything for the '*' user agent"""
+        rp = self.robot_parser
+        if rp.disallow_all:
+            return True
+        if rp.allow_all:
+            return False
+        if not rp.mtime():
+            return True  # Never parsed (e.g. a 5xx), so can_fetch() refuses everything
+        if rp.default_entry is None:
+            return False
+        
+        return any(not rule.allowance for rule in rp.default_entry.rulelines)
 
+    def open_chunk(self):
+        """Start a new chunk file and write its header"""
         os.makedirs('web_crawled_data', exist_ok=True)
         
-        filename = f"web_crawled_data/web_crawled_data_{timestamp}_chunk{self.chunk_counter}.json"
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.chunk_filename = f"web_crawled_data/web_crawled_data_{timestamp}_chunk{self.chunk_counter}.json"
+        if self.compressor:
+            self.chunk_filename += '.zst'
         
-        output = {
+        header = {
             'base_url': self.base_url,
             'crawl_date': datetime.now().isoformat(),
-            'chunk_number': self.chunk_counter,
-            'pages': self.current_chunk
+            'chunk_number': self.chunk_counter
         }
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(output, f, indent=4, ensure_ascii=False)
+        self.chunk_file = open(self.chunk_filename, 'wb')
+        if self.compressor:
+            self.chunk_file = self.compressor.stream_writer(self.chunk_file)  # Closes the file with it
+        # Leave the object open so pages can be appended as they are crawled
+        self.chunk_file.write(orjson.dumps(header)[:-1] + b',"pages":[')
+        self.chunk_pages = 0
+
+    def write_page(self, page_data):
+        """Append a page to the current chunk file, saving the chunk once it is full"""
+        if self.chunk_file is None:
+            self.open_chunk()
+        
+        self.chunk_file.write((b',\n' if self.chunk_pages else b'\n') + orjson.dumps(page_data))
+        self.chunk_pages += 1
         
-        print(f"Saved chunk {self.chunk_counter} to {filename}")
-        self.current_chunk = []  # Clear the chunk
+        if self.chunk_pages >= self.chunk_size:
+            self.save_chunk()
+
+    def save_chunk(self):
+        """Finish the current chunk file with its URL table"""
+        if self.chunk_file is None:
+            return
+
+        self.chunk_file.write(b'\n],"url_table":' + orjson.dumps(list(self.chunk_urls)) + b'}\n')
+        self.chunk_file.close()
+        
+        print(f"Saved chunk {self.chunk_counter} to {self.chunk_filename}")
+        self.chunk_file = None
+        self.chunk_urls = {}
         self.chunk_counter += 1
 
     def is_valid_url(self, url):
         """Check if URL belongs to the same domain and is under the specified path"""
-        parsed_url = urlparse(url)
-        
-        if any(pattern in url.lower() for pattern in exclude):
+        if EXCLUDE_RE.search(url):
             return False
         
         # Check if the URL is in the same domain and starts with the base path
-        return (self.domain in parsed_url.netloc and 
-                parsed_url.path.startswith(self.base_path) and 
-                self.robot_parser.can_fetch('*', url))
+        # robots.txt is only consulted when it has Disallow rules to match
+        return (url.startswith(self.url_prefixes) and 
+                (not self.robots_restricted or self.robot_parser.can_fetch('*', url)))
+
+    def is_valid_url_cached(self, url):
+        """Check URL validity, consulting the recently seen URL cache first"""
+        valid = self.recent_urls.get(url)
+        
+        if valid is not None:
+            self.recent_urls.move_to_end(url)
+            return valid
+        
+        valid = self.is_valid_url(url)
+        self.recent_urls[url] = valid
+        if len(self.recent_urls) > self.recent_urls_size:
+            self.recent_urls.popitem(last=False)  # Evict the least recently seen URL
+        
+        return valid
+
+    async def wait_for_host(self, host):
+        """Sleep until the crawl delay has passed since the host was last fetched"""
+        if not self.crawl_delay:
+            return
+        
+        async with self.host_locks.setdefault(host, asyncio.Lock()):
+            elapsed = time.monotonic() - self.last_fetched_at.get(host, float('-inf'))
+            if elapsed < self.crawl_delay:
+                await asyncio.sleep(self.crawl_delay - elapsed)
+            self.last_fetched_at[host] = time.monotonic()
+
+    async def fetch(self, session, url):
+        """Download raw page bytes and their declared charset"""
+        await self.wait_for_host(urlparse(url).netloc)
+        async with session.get(url) as response:
+            response.raise_for_status()
+            
+            if response.content_length and response.content_length > MAX_PAGE_BYTES:
+                raise ValueError(f"Page exceeds {MAX_PAGE_BYTES} bytes")
+            
+            # Content-Length can be missing or wrong, so enforce the cap while streaming
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(65536):
+                body += chunk
+                if len(body) > MAX_PAGE_BYTES:
+                    raise ValueError(f"Page exceeds {MAX_PAGE_BYTES} bytes")
+            
+            return bytes(body), response.charset, response.status
 
-    def get_page_content(self, url):
+    async def get_page_content(self, session, url):
         """Fetch and parse page content"""
         try:
-            response = self.session.get(url, headers=self.headers)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            content, charset, status_code = await self.fetch(session, url)
+            
+            # Parse off the event loop so it keeps serving I/O: big pages on other
+            # cores, small ones in a thread since lxml drops the GIL while parsing
+            if len(content) > PARSE_IN_PROCESS_BYTES:
+                loop = asyncio.get_running_loop()
+                parsed = await loop.run_in_executor(self.parse_pool, parse_page, content, charset)
+            else:
+                parsed = await asyncio.to_thread(parse_page, content, charset)
             
             page_data = {
                 'url': url,
-                'title': soup.title.string if soup.title else 'No title',
-                'text_content': soup.get_text(separator=' ', strip=True),
-                'meta_description': '',
+                'title': parsed['title'],
+                'text_content': parsed['text_content'],
+                'meta_description': parsed['meta_description'],
                 'links': [],
                 'timestamp': datetime.now().isoformat(),
-                'status_code': response.status_code
+                'status_code': status_code
             }
             
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc:
-                page_data['meta_description'] = meta_desc.get('content', '')
-            
-            return page_data, soup
+            return page_data, parsed['hrefs']
             
         except Exception as e:
             print(f"Error fetching {url}: {str(e)}")
             return None, None
 
-    def extract_links(self, soup, current_url):
-        """Extract all links from the page"""
-        links = []
-        
-        if soup:
-            for link in soup.find_all('a', href=True):
-                url = link['href']
-                absolute_url = urljoin(current_url, url)
-                if self.is_valid_url(absolute_url):
-                    links.append(absolute_url)
-                    
-        return links
-
-    def crawl_page(self, current_url, depth):
-        """Crawl a single page and extract links"""
-        if depth > self.max_depth or current_url in self.visited_urls:
-            return
+    def extract_links(self, hrefs, current_url):
+        """Resolve the page's hrefs and keep the ones worth crawling"""
+        if not hrefs:
+            return []
         
-        print(f"Crawling: {current_url}")
+        parts = urlsplit(current_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
         
-        self.visited_urls.add(current_url)
+        # dict.fromkeys drops repeated hrefs, then repeated URLs, keeping page order
+        urls = dict.fromkeys(resolve_href(current_url, origin, href) for href in dict.fromkeys(hrefs)
+                             if not href.startswith(SKIP_HREF_PREFIXES))
         
-        page_data, soup = self.get_page_content(current_url)
+        is_valid_url = self.is_valid_url_cached
+        return [url for url in urls if url and is_valid_url(url)]
+
+    async def crawl_page(self, session, current_url):
+        """Crawl a single page and return the links found on it"""
+        print(f"Crawling: {current_url}")
         
-        if page_data:
-            links = self.extract_links(soup, current_url)
-            page_data['links'] = links
-            self.current_chunk.append(page_data)
-            self.total_pages += 1
-            
-            # Save chunk when it reaches the chunk size
-            if len(self.current_chunk) >= self.chunk_size:
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                self.save_chunk(timestamp)
+        page_data, hrefs = await self.get_page_content(session, current_url)
+        
+        if not page_data:
+            return []
+
+        links = self.extract_links(hrefs, current_url)
+
+        # Pages with no text (e.g. script-rendered) are always kept
+        if page_data['text_content']:
+            content_hash = hashlib.blake2b(page_data['text_content'].encode('utf-8'), digest_size=16).digest()
+            if content_hash in self.content_hashes:
+                print(f"Skipping duplicate content: {current_url}")
+                return links
+            self.content_hashes.add(content_hash)
+
+        # Store each distinct link once per chunk and refer to it by index
+        page_data['links'] = [self.chunk_urls.setdefault(link, len(self.chunk_urls))
+                              for link in links]
+        self.write_page(page_data)
+        self.total_pages += 1
+
+        return links
+
+    async def worker(self, session, queue):
+        """Crawl (url, depth) pairs from the queue until cancelled"""
+        while True:
+            url, depth = await queue.get()
+            try:
+                links = await self.crawl_page(session, url)
 
-            # Crawl extracted links recursively up to max depth
-            for link in links:
-                self.crawl_page(link, depth + 1)
+                # Queue extracted links up to max depth
+                if depth < self.max_depth:
+                    for link in links:
+                        if link not in self.visited_urls:
+                            self.visited_urls.add(link)
+                            queue.put_nowait((link, depth + 1))
+            except Exception as e:
+                print(f"Failed to crawl {url}: {str(e)}")
+            finally:
+                queue.task_done()
 
-    def crawl(self):
+    async def crawl_async(self):
         """Main crawling function"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
         # Start crawling from the base URL at depth 0
-        self.crawl_page(self.base_url, 0)
+        queue = asyncio.Queue()
+        self.visited_urls.add(self.base_url)
+        queue.put_nowait((self.base_url, 0))
 
-        # Save any remaining pages in the last chunk
-        if self.current_chunk:
-            self.save_chunk(timestamp)
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+            enable_cleanup_closed=True
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout,
+                                        connect=min(CONNECT_TIMEOUT, self.timeout))
+        try:
+            # Spawned, not forked: a fork while a parse thread holds libxml2's locks deadlocks the child
+            with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as self.parse_pool:
+                async with aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                                 timeout=timeout) as session:
+                    # One worker per allowed connection keeps at most `concurrency` fetches in flight
+                    workers = [asyncio.create_task(self.worker(session, queue))
+                               for _ in range(self.concurrency)]
+                    await queue.join()
+
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            # Close out the last chunk even on Ctrl-C or errors, so no file is left truncated
+            self.save_chunk()
 
         print(f"\nCrawl completed! Total pages crawled: {self.total_pages}")
         
@@ -203,11 +445,17 @@ def main():
         
         max_depth = int(input("Enter maximum crawl depth (default is 3): ").strip() or 3)
         
-        crawler = WebCrawler(url, chunk_size=chunk_size, max_depth=max_depth)
+        concurrency = int(input("Enter number of concurrent requests (default is 10): ").strip() or 10)
+        
+        compress = input("Compress chunks with zstd? (y/N): ").strip().lower() == 'y'
+        
+        crawler = WebCrawler(url, chunk_size=chunk_size, max_depth=max_depth, concurrency=concurrency,
+                             compress=compress)
         
         print(f"\nStarting crawl of {url}")
         
-        crawler.crawl()
+        run = uvloop.run if uvloop else asyncio.run
+        run(crawler.crawl_async())
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")